@@ -2,11 +2,14 @@
 
 from __future__ import annotations
 
-import os, re, ssl, smtplib
-from typing import Optional, Dict, Any, List, Tuple
+import os, re, ssl, smtplib, itertools, threading
+from time import sleep
+from uuid import uuid4
+from typing import Optional, Dict, Any, List, Tuple, Sequence, Set, NamedTuple, Iterator
+from enum import Enum
 from email.message import EmailMessage
 from concurrent.futures import ThreadPoolExecutor
-from datetime import datetime, date, time, timedelta
+from datetime import datetime, date, time, timedelta, timezone
 from zoneinfo import ZoneInfo
 
 import streamlit as st
@@ -23,6 +26,23 @@ except Exception:
 def now_local() -> datetime:
     return datetime.now(TZINFO)
 
+def now_utc_iso() -> str:
+    """Storage format for booking timestamps: ISO-8601 in UTC, e.g. 2025-01-31T08:30:00+00:00."""
+    return datetime.now(timezone.utc).isoformat(timespec="seconds")
+
+def to_utc_iso(value) -> Optional[str]:
+    """Normalize a stored timestamp (naive, any offset, or 'Z') to now_utc_iso's format.
+
+    Naive values are taken as UTC, matching how the old display path read them.
+    """
+    try:
+        dt = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip())
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt.astimezone(timezone.utc).isoformat(timespec="seconds")
+
 def parse_session_date(d) -> date:
     if isinstance(d, date):
         return d
@@ -59,18 +79,18 @@ def _db_url() -> str | None:
 def _is_postgres_conn(conn) -> bool:
     return conn.__class__.__module__.startswith("psycopg2")
 
-def _is_dml(sql: str) -> bool:
-    head = sql.strip().split()[0].upper() if sql else ""
-    return head in {"INSERT", "UPDATE", "DELETE", "CREATE", "DROP", "ALTER"}
-
 def _adapt_sql(sql: str, conn) -> str:
-    # Use %s for Postgres, ? for SQLite
+    # Use %s for Postgres, ? for SQLite; SQLite's LIKE is already case-insensitive
     if _is_postgres_conn(conn):
         return sql
-    return sql.replace("%s", "?")
+    return sql.replace("%s", "?").replace(" ILIKE ", " LIKE ")
+
+SQLITE_PATH = "cordova_publication.db"
+SQLITE_READERS = 4
 
 @st.cache_resource
 def get_conn():
+    """Writer connection (the only one used for INSERT/UPDATE/DELETE; always under _write_lock)."""
     url = _db_url()
     if url:
         import psycopg2
@@ -80,25 +100,68 @@ def get_conn():
         return conn
     else:
         import sqlite3
-        conn = sqlite3.connect("cordova_publication.db", check_same_thread=False)
+        # Autocommit like the Postgres branch; multi-statement work uses explicit BEGIN
+        conn = sqlite3.connect(SQLITE_PATH, check_same_thread=False, isolation_level=None)
         conn.execute("PRAGMA journal_mode=WAL;")
         conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        conn.execute("PRAGMA busy_timeout=3000;")
         _ensure_schema(conn)
         return conn
 
+@st.cache_resource
+def _write_lock() -> threading.Lock:
+    return threading.Lock()
+
+@st.cache_resource
+def _readers() -> list:
+    # WAL lets readers run alongside the writer, so SQLite SELECTs go through a
+    # small pool of read-only connections. Postgres gets its own autocommit reader
+    # so SELECTs never run inside a booking transaction open on the writer.
+    writer = get_conn()  # creates the DB file + schema before opening mode=ro
+    if _is_postgres_conn(writer):
+        import psycopg2
+        conn = psycopg2.connect(_db_url(), sslmode="require")
+        conn.autocommit = True
+        return [conn]
+    import sqlite3
+    pool = []
+    for _ in range(SQLITE_READERS):
+        conn = sqlite3.connect(f"file:{SQLITE_PATH}?mode=ro", uri=True, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL;")
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        conn.execute("PRAGMA temp_store=MEMORY;")
+        pool.append(conn)
+    return pool
+
+_reader_seq = itertools.count()
+
+def _read_conn():
+    pool = _readers()
+    return pool[next(_reader_seq) % len(pool)]
+
 def _exec(sql: str, args: tuple = ()):
     conn = get_conn()
     sql2 = _adapt_sql(sql, conn)
-    cur = conn.cursor()
-    cur.execute(sql2, args)
-    # Auto-commit for SQLite if DML (Postgres autocommit already True)
-    if not _is_postgres_conn(conn) and _is_dml(sql):
-        conn.commit()
+    with _write_lock():
+        cur = conn.cursor()
+        cur.execute(sql2, args)  # both engines are in autocommit mode
     return cur
 
-def _fetchall_dict(sql: str, args: tuple = ()) -> List[Dict[str, Any]]:
+def _exec_returning(sql: str, args: tuple = ()):
+    """Run a write with a RETURNING clause and fetch its first row under the write lock."""
     conn = get_conn()
     sql2 = _adapt_sql(sql, conn)
+    with _write_lock():
+        cur = conn.cursor()
+        cur.execute(sql2, args)
+        row = cur.fetchone()
+        cur.close()
+    return row
+
+def _fetchall_dict(sql: str, args: tuple = ()) -> List[Dict[str, Any]]:
+    conn = _read_conn()
+    sql2 = _adapt_sql(sql, conn)
     cur = conn.cursor()
     cur.execute(sql2, args)
     rows = cur.fetchall()
@@ -107,7 +170,7 @@ def _fetchall_dict(sql: str, args: tuple = ()) -> List[Dict[str, Any]]:
     return [dict(zip(cols, r)) for r in rows]
 
 def _fetchone_val(sql: str, args: tuple = ()):
-    conn = get_conn()
+    conn = _read_conn()
     sql2 = _adapt_sql(sql, conn)
     cur = conn.cursor()
     cur.execute(sql2, args)
@@ -210,9 +273,34 @@ def _ensure_schema(conn) -> None:
         cur.execute("CREATE INDEX IF NOT EXISTS idx_unavail_teacher_date ON teacher_unavailability(teacher, date);")
         cur.execute("CREATE INDEX IF NOT EXISTS idx_email_ts ON email_events(ts);")
         conn.commit()
+        _backfill_utc_timestamps(conn)
+
+    # Composite keys the booking rules filter on (same DDL for both engines)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_teacher_date_slot ON bookings(teacher, date, slot);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_unavail_date_slot ON teacher_unavailability(date, slot);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_sp_date_ts ON bookings(salesperson_email, date, timestamp);")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_bookings_date_id ON bookings(date, id);")
+    try:
+        cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS uniq_booking_key ON bookings(school_name, subject, date, slot);")
+    except Exception as e:
+        # Older databases may already hold duplicates; the rule checks still apply
+        print(f"[DB] uniq_booking_key not created: {e}")
     cur.close()
 
 
+def _backfill_utc_timestamps(conn) -> None:
+    """One-time rewrite of older SQLite rows (local/naive strings) to UTC ISO-8601.
+
+    Postgres stores TIMESTAMPTZ, so only the SQLite TEXT column needs this.
+    """
+    rows = conn.execute("SELECT id, timestamp FROM bookings WHERE timestamp NOT LIKE '%+00:00'").fetchall()
+    fixed = [(ts, bid) for bid, ts in ((bid, to_utc_iso(raw)) for bid, raw in rows) if ts]
+    if fixed:
+        conn.execute("BEGIN")
+        conn.executemany("UPDATE bookings SET timestamp=? WHERE id=?", fixed)
+        conn.execute("COMMIT")
+
+
 # -----------------------------------------------------------------------------
 # Capacity configuration
 # -----------------------------------------------------------------------------
@@ -252,6 +340,20 @@ def is_teacher_unavailable(teacher: str, day: str, slot: str) -> bool:
     ) or 0
     return int(cnt) > 0
 
+@st.cache_data(show_spinner=False, ttl=60)
+def unavailable_teachers_for(day: str, slot: str, teachers: Sequence[str]) -> Set[str]:
+    """Subset of `teachers` blocked on (day, slot), fetched with a single IN query."""
+    teachers = list(teachers)
+    if not teachers:
+        return set()
+    marks = ", ".join(["%s"] * len(teachers))
+    rows = _fetchall_dict(
+        f"""SELECT DISTINCT teacher FROM teacher_unavailability
+            WHERE date=%s AND (slot IS NULL OR slot=%s) AND teacher IN ({marks})""",
+        (day, slot, *teachers),
+    )
+    return {r["teacher"] for r in rows}
+
 def teacher_busy(teacher: str, day: str, slot: str) -> bool:
     row = _fetchone_val(
         "SELECT 1 FROM bookings WHERE teacher=%s AND date=%s AND slot=%s LIMIT 1",
@@ -279,8 +381,10 @@ def count_parallel_on_slot(day: str, slot: str) -> int:
 # Teacher choice (availability + caps)
 # -----------------------------------------------------------------------------
 def pick_teacher(subject: str, day: str, slot: str) -> Optional[str]:
-    for t in candidates_for_subject(subject):
-        if is_teacher_unavailable(t, day, slot):
+    tlist = candidates_for_subject(subject)
+    blocked = unavailable_teachers_for(day, slot, tlist)
+    for t in tlist:
+        if t in blocked:
             continue
         if teacher_busy(t, day, slot):
             continue
@@ -306,6 +410,137 @@ def _enforce_booking_window(day_str: str, slot_str: str) -> Tuple[bool, str]:
         return False, "❌ You can only book for tomorrow before 02:00 PM."
     return True, ""
 
+_INSERT_BOOKING_SQL = """INSERT INTO bookings (
+    booking_type, school_name, title_used, grade, curriculum, subject,
+    date, slot, topic, salesperson_name, salesperson_number,
+    salesperson_email, teacher, timestamp
+) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"""
+
+def _booking_params(data: Dict[str, Any], teacher: str) -> tuple:
+    return (
+        data["booking_type"], data["school_name"], data.get("title_used"),
+        data.get("grade"), data.get("curriculum"), data["subject"],
+        data["date"], data["slot"], data.get("topic"),
+        data["salesperson_name"], data["salesperson_number"],
+        data["salesperson_email"], teacher, now_utc_iso(),
+    )
+
+@st.cache_resource
+def _booking_key_ok() -> bool:
+    """Whether uniq_booking_key exists (_ensure_schema only logs it if old duplicates block it)."""
+    conn = _read_conn()
+    if _is_postgres_conn(conn):
+        sql = "SELECT 1 FROM pg_indexes WHERE tablename='bookings' AND indexname='uniq_booking_key'"
+    else:
+        sql = "SELECT 1 FROM sqlite_master WHERE type='index' AND name='uniq_booking_key'"
+    return _fetchone_val(sql) is not None
+
+def _insert_booking_returning_sql() -> str:
+    """INSERT ... RETURNING id; with the key in place a duplicate returns no row instead of raising.
+
+    The conflict target is explicit so other unique indexes (e.g. uniq_teacher_slot) still raise.
+    """
+    if _booking_key_ok():
+        return _INSERT_BOOKING_SQL + " ON CONFLICT (school_name, subject, date, slot) DO NOTHING RETURNING id"
+    return _INSERT_BOOKING_SQL + " RETURNING id"
+
+class BookingStatus(Enum):
+    OK = "ok"
+    CLOSED = "closed"              # outside the booking window
+    SLOT_FULL = "slot_full"
+    DUPLICATE = "duplicate"
+    NO_TEACHER = "no_teacher"      # nobody is mapped to the subject
+    TEACHER_BUSY = "teacher_busy"  # mapped teachers are all unavailable, busy or at their daily cap
+
+_STATUS_MESSAGES = {
+    BookingStatus.OK: "Booking successfully created.",
+    BookingStatus.SLOT_FULL: "This slot is full. Please choose another time.",
+    BookingStatus.DUPLICATE: "This school & subject is already booked for that date & slot.",
+    BookingStatus.NO_TEACHER: "No teacher is mapped to this subject.",
+    BookingStatus.TEACHER_BUSY: "No teacher available for this subject/date/slot.",
+}
+
+class BookingResult(NamedTuple):
+    status: BookingStatus
+    teacher: Optional[str]
+    message: str
+
+def _choose_from_day(day_rows: list, subject: str, school: str, slot: str) -> Tuple[Optional[str], BookingStatus]:
+    """Apply the slot/duplicate/teacher rules to one day's bookings + unavailability rows."""
+    in_slot = [r for r in day_rows if r[0] == "booking" and r[2] == slot]
+    if len(in_slot) >= MAX_PARALLEL_CLASSES_PER_SLOT:
+        return None, BookingStatus.SLOT_FULL
+    if any(r[3] == school and r[4] == subject for r in in_slot):
+        return None, BookingStatus.DUPLICATE
+
+    tlist = candidates_for_subject(subject)
+    if not tlist:
+        return None, BookingStatus.NO_TEACHER
+    busy = {r[1] for r in in_slot}
+    blocked = {r[1] for r in day_rows if r[0] == "unavailable" and (r[2] is None or r[2] == slot)}
+    per_day: Dict[str, int] = {}
+    for r in day_rows:
+        if r[0] == "booking":
+            per_day[r[1]] = per_day.get(r[1], 0) + 1
+    for t in tlist:
+        if t in blocked or t in busy:
+            continue
+        if per_day.get(t, 0) >= daily_limit_for_teacher(t):
+            continue
+        return t, BookingStatus.OK
+    return None, BookingStatus.TEACHER_BUSY
+
+def try_record_booking(data: Dict[str, Any]) -> BookingResult:
+    """Check the rules, pick a teacher and insert in a single transaction.
+
+    `data` is the booking form without "teacher"; the result carries the teacher on OK.
+    """
+    day, slot = data["date"], data["slot"]
+    ok, msg = _enforce_booking_window(day, slot)
+    if not ok:
+        return BookingResult(BookingStatus.CLOSED, None, msg)
+
+    insert_sql = _insert_booking_returning_sql()  # resolved before taking the lock
+    conn = get_conn()
+    pg = _is_postgres_conn(conn)
+    with _write_lock():
+        cur = conn.cursor()
+        try:
+            if pg:
+                cur.execute("BEGIN")
+                cur.execute("LOCK TABLE bookings IN SHARE ROW EXCLUSIVE MODE")
+            else:
+                cur.execute("BEGIN IMMEDIATE")
+            # One round-trip for everything the rules need about this day
+            cur.execute(_adapt_sql(
+                """SELECT 'booking', teacher, slot, school_name, subject
+                   FROM bookings WHERE date=%s
+                   UNION ALL
+                   SELECT 'unavailable', teacher, slot, NULL, NULL
+                   FROM teacher_unavailability WHERE date=%s""", conn), (day, day))
+            teacher, status = _choose_from_day(cur.fetchall(), data["subject"], data["school_name"], slot)
+            if teacher:
+                # uniq_booking_key backstops the duplicate rule if the table was written outside this path
+                cur.execute(_adapt_sql(insert_sql, conn), _booking_params(data, teacher))
+                if cur.fetchone() is None:
+                    teacher, status = None, BookingStatus.DUPLICATE
+            if pg:
+                cur.execute("COMMIT")
+            else:
+                conn.commit()
+        except Exception:
+            if pg:
+                cur.execute("ROLLBACK")
+            else:
+                conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    if teacher:
+        _clear_booking_caches()
+    return BookingResult(status, teacher, _STATUS_MESSAGES[status])
+
 def record_booking(data: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
     day   = data["date"]
     slot  = data["slot"]
@@ -320,44 +555,24 @@ def record_booking(data: Dict[str, Any]) -> Tuple[bool, str, Optional[int]]:
     if count_parallel_on_slot(day, slot) >= MAX_PARALLEL_CLASSES_PER_SLOT:
         return False, "This slot is full. Please choose another time.", None
 
-    if exists_booking(school, subj, day, slot):
-        return False, "This school & subject is already booked for that date & slot.", None
-
     if is_teacher_unavailable(teacher, day, slot) or teacher_busy(teacher, day, slot):
         return False, "Selected teacher is not available in this slot.", None
 
     if count_teacher_on_day(teacher, day) >= daily_limit_for_teacher(teacher):
         return False, f"{teacher} has reached the daily limit ({daily_limit_for_teacher(teacher)}).", None
 
-    booked_ts = now_local().isoformat(timespec="seconds")
-
-    cur = _exec(
-        """INSERT INTO bookings (
-            booking_type, school_name, title_used, grade, curriculum, subject,
-            date, slot, topic, salesperson_name, salesperson_number,
-            salesperson_email, teacher, timestamp
-        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)""",
-        (
-            data["booking_type"], data["school_name"], data.get("title_used"),
-            data.get("grade"), data.get("curriculum"), data["subject"],
-            day, slot, data.get("topic"),
-            data["salesperson_name"], data["salesperson_number"],
-            data["salesperson_email"], teacher, booked_ts,
-        ),
-    )
-    # Return ID in a portable way
-    new_id = None
-    try:
-        # Postgres: RETURNING id (not used here to remain portable)
-        new_id = _fetchone_val("SELECT MAX(id) FROM bookings")
-    except Exception:
-        pass
-    cur.close()
-    get_all_bookings.clear(); get_bookings_for_salesperson.clear()
-    return True, "Booking successfully created.", int(new_id) if new_id else None
+    # uniq_booking_key turns the school/subject/date/slot duplicate check into the insert itself;
+    # without it (old data blocked the index) fall back to checking first
+    if not _booking_key_ok() and exists_booking(school, subj, day, slot):
+        return False, "This school & subject is already booked for that date & slot.", None
+    row = _exec_returning(_insert_booking_returning_sql(), _booking_params(data, teacher))
+    if row is None:
+        return False, "This school & subject is already booked for that date & slot.", None
+    _clear_booking_caches()
+    return True, "Booking successfully created.", int(row[0])
 
 @st.cache_data(show_spinner=False, ttl=60)
-def get_bookings_for_salesperson(email: str) -> List[Dict[str, Any]]:
+def get_bookings_for_salesperson(email: str, limit: Optional[int] = None, offset: int = 0) -> List[Dict[str, Any]]:
     sql = """
     SELECT booking_type AS "Type",
            school_name  AS "School",
@@ -371,11 +586,16 @@ def get_bookings_for_salesperson(email: str) -> List[Dict[str, Any]]:
     WHERE salesperson_email=%s
     ORDER BY date DESC, timestamp DESC
     """
-    return _fetchall_dict(sql, (email,))
+    if limit is None:
+        return _fetchall_dict(sql, (email,))
+    return _fetchall_dict(sql + " LIMIT %s OFFSET %s", (email, int(limit), int(offset)))
 
 @st.cache_data(show_spinner=False, ttl=60)
-def get_all_bookings() -> List[Dict[str, Any]]:
-    sql = """
+def count_bookings_for_salesperson(email: str) -> int:
+    cnt = _fetchone_val("SELECT COUNT(*) FROM bookings WHERE salesperson_email=%s", (email,)) or 0
+    return int(cnt)
+
+_BOOKINGS_SELECT = """
     SELECT id                                   AS "id",
            booking_type                          AS "Type",
            school_name                           AS "School",
@@ -391,11 +611,115 @@ def get_all_bookings() -> List[Dict[str, Any]]:
            salesperson_number                    AS "Salesperson Number",
            salesperson_email                     AS "Salesperson Email",
            timestamp                             AS "Booked On"
-    FROM bookings
+    FROM bookings"""
+
+@st.cache_data(show_spinner=False, ttl=60)
+def get_all_bookings() -> List[Dict[str, Any]]:
+    sql = _BOOKINGS_SELECT + """
     ORDER BY date DESC, timestamp DESC
     """
     return _fetchall_dict(sql)
 
+def _booking_where(subject: Optional[str] = None, salesperson: Optional[str] = None,
+                   school: Optional[str] = None, day: Optional[str] = None,
+                   q: Optional[str] = None) -> Tuple[str, tuple]:
+    """WHERE clause + args for the admin filters; None means "no filter"."""
+    clauses, args = [], []
+    if subject:
+        clauses.append("subject=%s"); args.append(subject)
+    if salesperson:
+        clauses.append("salesperson_name=%s"); args.append(salesperson)
+    if school:
+        clauses.append("school_name=%s"); args.append(school)
+    if day:
+        clauses.append("date=%s"); args.append(str(day))
+    if q:
+        # ILIKE matches case-insensitively without lowercasing every row first.
+        # The query is a plain substring: % and _ typed by the user are escaped, not wildcards.
+        term = q.strip().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        like = f"%{term}%"
+        clauses.append("(school_name ILIKE %s ESCAPE '\\' OR subject ILIKE %s ESCAPE '\\'"
+                       " OR teacher ILIKE %s ESCAPE '\\')")
+        args += [like, like, like]
+    return (" WHERE " + " AND ".join(clauses)) if clauses else "", tuple(args)
+
+@st.cache_data(show_spinner=False, ttl=60)
+def get_bookings_page(subject: Optional[str] = None, salesperson: Optional[str] = None,
+                      school: Optional[str] = None, day: Optional[str] = None,
+                      q: Optional[str] = None, after: Optional[Tuple[str, int]] = None,
+                      limit: int = 25) -> List[Dict[str, Any]]:
+    """
+    One page of filtered bookings, newest first, using keyset pagination.
+    `after` is the (Date, id) of the last row of the previous page; None starts at the top.
+    """
+    where, args = _booking_where(subject, salesperson, school, day, q)
+    if after:
+        where += (" AND " if where else " WHERE ") + "(date < %s OR (date = %s AND id < %s))"
+        args += (after[0], after[0], int(after[1]))
+    sql = _BOOKINGS_SELECT + where + " ORDER BY date DESC, id DESC LIMIT %s"
+    return _fetchall_dict(sql, args + (int(limit),))
+
+@st.cache_data(show_spinner=False, ttl=60)
+def count_bookings_filtered(subject: Optional[str] = None, salesperson: Optional[str] = None,
+                            school: Optional[str] = None, day: Optional[str] = None,
+                            q: Optional[str] = None) -> int:
+    where, args = _booking_where(subject, salesperson, school, day, q)
+    return int(_fetchone_val("SELECT COUNT(*) FROM bookings" + where, args) or 0)
+
+@st.cache_data(show_spinner=False, ttl=60)
+def get_booking_facets() -> Dict[str, Any]:
+    """Header metrics and filter choices for the admin view, without loading every row."""
+    total, schools, teachers = _fetchone_val(
+        "SELECT COUNT(*), COUNT(DISTINCT school_name), COUNT(DISTINCT teacher) FROM bookings"
+    )
+    # All three filter choice lists in one round-trip, already sorted per list
+    options: Dict[str, List[str]] = {"Subject": [], "Salesperson": [], "School": []}
+    for r in _fetchall_dict(
+        """SELECT 'Subject' AS k, subject AS v FROM bookings WHERE subject IS NOT NULL
+           UNION SELECT 'Salesperson', salesperson_name FROM bookings WHERE salesperson_name IS NOT NULL
+           UNION SELECT 'School', school_name FROM bookings WHERE school_name IS NOT NULL
+           ORDER BY 1, 2"""
+    ):
+        options[r["k"]].append(r["v"])
+    return {"total": int(total or 0), "schools": int(schools or 0), "teachers": int(teachers or 0), **options}
+
+def iter_bookings(batch_size: int = 5000) -> Iterator[List[Dict[str, Any]]]:
+    """Every booking (get_all_bookings columns), newest first, in batches of `batch_size` rows.
+
+    Postgres uses a server-side cursor on the reader connection (never inside a booking
+    transaction) so only one batch is held in memory at a time; each export gets its own
+    cursor name so concurrent exports don't collide.
+    """
+    conn = _read_conn()
+    pg = _is_postgres_conn(conn)
+    cur = conn.cursor(name=f"bookings_export_{uuid4().hex}", withhold=True) if pg else conn.cursor()
+    try:
+        cur.execute(_adapt_sql(_BOOKINGS_SELECT + " ORDER BY date DESC, id DESC", conn))
+        cols = None
+        while True:
+            rows = cur.fetchmany(batch_size)
+            if not rows:
+                break
+            if cols is None:
+                cols = [d[0] for d in cur.description]
+            yield [dict(zip(cols, r)) for r in rows]
+    finally:
+        cur.close()
+
+@st.cache_data(show_spinner=False, ttl=300)
+def get_distinct_teachers() -> List[str]:
+    rows = _fetchall_dict("SELECT DISTINCT teacher FROM bookings WHERE teacher IS NOT NULL")
+    return [r["teacher"] for r in rows]
+
+def _clear_booking_caches() -> None:
+    get_all_bookings.clear()
+    get_bookings_for_salesperson.clear()
+    count_bookings_for_salesperson.clear()
+    get_bookings_page.clear()
+    count_bookings_filtered.clear()
+    get_booking_facets.clear()
+    get_distinct_teachers.clear()
+
 def delete_booking(booking_id_or_row) -> None:
     if isinstance(booking_id_or_row, int):
         _exec("DELETE FROM bookings WHERE id=%s", (booking_id_or_row,))
@@ -408,7 +732,7 @@ def delete_booking(booking_id_or_row) -> None:
                        AND salesperson_name=%s AND teacher=%s""",
               (row["school_name"], row["subject"], row["date"], row["slot"],
                row["salesperson_name"], row["teacher"]))
-    get_all_bookings.clear(); get_bookings_for_salesperson.clear()
+    _clear_booking_caches()
 
 
 # -----------------------------------------------------------------------------
@@ -492,50 +816,107 @@ def _log_email(to_addr: str, subject: str, status: str, error: str | None = None
         "INSERT INTO email_events (ts, to_addr, subject, status, error) VALUES (%s, %s, %s, %s, %s)",
         (now_local().isoformat(timespec="seconds"), to_addr, subject, status, error),
     )
+    get_email_events.clear()
 
-def _smtp_send(to_addr: str, subject: str, body: str) -> None:
-    if not to_addr:
-        _elog("skip: empty to_addr"); return
-
+def _smtp_config() -> tuple:
     host = st.secrets.get("EMAIL_HOST", "smtp.gmail.com")
     port = int(st.secrets.get("EMAIL_PORT", 587))
     user = st.secrets.get("EMAIL_USER", "")
     pwd  = st.secrets.get("EMAIL_PASS", "")
     use_tls = str(st.secrets.get("EMAIL_USE_TLS", "true")).lower() == "true"
+    return host, port, user, pwd, use_tls
 
-    if not (host and port and user and pwd):
-        _elog("skip: incomplete secrets")
-        _log_email(to_addr, subject, "failed", "incomplete secrets")
-        return
+def _secrets_ok() -> bool:
+    host, port, user, pwd, _ = _smtp_config()
+    return bool(host and port and user and pwd)
+
+# Resolved once per process: with incomplete secrets every send is a no-op
+# (no message building, no "failed" rows written to email_events).
+try:
+    _EMAIL_ENABLED = _secrets_ok()
+except Exception:
+    _EMAIL_ENABLED = False
+if not _EMAIL_ENABLED:
+    _elog("disabled: incomplete secrets")
+
+def _smtp_open(host: str, port: int, user: str, pwd: str, use_tls: bool):
+    """Connected + logged-in SMTP client; use as a context manager."""
+    if use_tls:
+        s = smtplib.SMTP(host, port, timeout=12)
+    else:
+        ssl_port = 465 if port == 587 else port
+        s = smtplib.SMTP_SSL(host, ssl_port, timeout=12)
+    try:
+        if use_tls:
+            s.starttls(context=ssl.create_default_context())
+        s.login(user, pwd)
+    except Exception:
+        s.close()
+        raise
+    return s
 
+def _build_message(sender: str, to_addr: str, subject: str, body: str) -> EmailMessage:
     msg = EmailMessage()
-    msg["From"] = user
+    msg["From"] = sender
     msg["To"] = to_addr
     msg["Subject"] = subject
     msg.set_content(body, subtype="plain", charset="utf-8")
+    return msg
+
+def _smtp_send(to_addr: str, subject: str, body: str, attempts: int = 2, backoff: float = 0.0) -> None:
+    if not _EMAIL_ENABLED:
+        return
+    if not to_addr:
+        _elog("skip: empty to_addr"); return
+
+    host, port, user, pwd, use_tls = _smtp_config()
+    msg = _build_message(user, to_addr, subject, body)
 
     last_err = None
-    for attempt in (1, 2):
+    for attempt in range(1, attempts + 1):
         try:
             _elog(f"sending (try {attempt}) → to={to_addr}, host={host}:{port}, tls={use_tls}")
-            if use_tls:
-                with smtplib.SMTP(host, port, timeout=12) as s:
-                    s.starttls(context=ssl.create_default_context())
-                    s.login(user, pwd)
-                    s.send_message(msg)
-            else:
-                ssl_port = 465 if port == 587 else port
-                with smtplib.SMTP_SSL(host, ssl_port, timeout=12) as s:
-                    s.login(user, pwd)
-                    s.send_message(msg)
+            with _smtp_open(host, port, user, pwd, use_tls) as s:
+                s.send_message(msg)
             _elog(f"sent ✓ to={to_addr}")
             _log_email(to_addr, subject, "sent", None)
             return
         except Exception as e:
             last_err = str(e)
             _elog(f"FAIL try {attempt} to={to_addr}: {e}")
+            if backoff and attempt < attempts:
+                sleep(backoff * 2 ** (attempt - 1))
     _log_email(to_addr, subject, "failed", last_err)
 
+def _smtp_send_batch(messages: List[Tuple[str, str, str]], attempts: int = 2, backoff: float = 0.0) -> None:
+    """Send several messages over one SMTP session (one TLS handshake + login).
+
+    Anything not delivered on the shared session falls back to _smtp_send,
+    which retries per message.
+    """
+    if not _EMAIL_ENABLED:
+        return
+    pending = [m for m in messages if m[0]]
+    if len(pending) <= 1:
+        for m in pending:
+            _smtp_send(*m, attempts, backoff)
+        return
+
+    host, port, user, pwd, use_tls = _smtp_config()
+    try:
+        _elog(f"batch sending {len(pending)} → host={host}:{port}, tls={use_tls}")
+        with _smtp_open(host, port, user, pwd, use_tls) as s:
+            while pending:
+                to_addr, subject, body = pending[0]
+                s.send_message(_build_message(user, to_addr, subject, body))
+                _elog(f"sent ✓ to={to_addr}")
+                _log_email(to_addr, subject, "sent", None)
+                pending.pop(0)
+    except Exception as e:
+        _elog(f"batch session failed ({e}); retrying {len(pending)} individually")
+        for m in pending:
+            _smtp_send(*m, attempts, backoff)
+
 @st.cache_resource
 def get_mail_executor() -> ThreadPoolExecutor:
     return ThreadPoolExecutor(max_workers=4)
@@ -543,13 +924,59 @@ def get_mail_executor() -> ThreadPoolExecutor:
 def _email_sync_mode() -> bool:
     return str(st.secrets.get("EMAIL_SYNC", "true")).lower() == "true"
 
+MAIL_QUEUE_LIMIT = 32
+# Queued sends run off the UI thread, so they can afford to retry with backoff (1s, 2s, 4s, 8s)
+MAIL_RETRIES = 5
+MAIL_RETRY_BACKOFF = 1.0
+
+@st.cache_resource
+def _mail_slots() -> threading.BoundedSemaphore:
+    return threading.BoundedSemaphore(MAIL_QUEUE_LIMIT)
+
+def _submit_mail(messages: List[Tuple[str, str, str]]) -> None:
+    # Fire-and-forget with a bounded backlog; when full, send inline instead of queueing.
+    slots = _mail_slots()
+    if not slots.acquire(blocking=False):
+        _elog(f"queue full, sending {len(messages)} inline")
+        _smtp_send_batch(messages)
+        return
+
+    def _done(fut):
+        slots.release()
+        exc = fut.exception()
+        if exc is None:
+            return
+        _elog(f"background send failed: {exc}")
+        # Surface it in the admin Email Log, not just stdout
+        for to_addr, subject, _ in messages:
+            try:
+                _log_email(to_addr, subject, "failed", str(exc))
+            except Exception as e:
+                _elog(f"could not log failure for {to_addr}: {e}")
+
+    get_mail_executor().submit(
+        _smtp_send_batch, messages, MAIL_RETRIES, MAIL_RETRY_BACKOFF
+    ).add_done_callback(_done)
+
 def _send_async(to_addr: str, subject: str, body: str):
-    if _email_sync_mode():
-        _smtp_send(to_addr, subject, body)
+    _send_many([(to_addr, subject, body)])
+
+def _send_many(messages: List[Tuple[str, str, str]], wait: Optional[bool] = None) -> None:
+    # All recipients of one event share a single SMTP session. Sync mode sends
+    # before returning; async mode hands the batch to the mail pool.
+    if not _EMAIL_ENABLED or not messages:
+        return
+    if wait is None:
+        wait = _email_sync_mode()
+    if wait:
+        _smtp_send_batch(messages)
     else:
-        get_mail_executor().submit(_smtp_send, to_addr, subject, body)
+        _submit_mail(messages)
+
+def send_confirmation_emails(booking: Dict[str, Any], wait: Optional[bool] = None) -> None:
+    if not _EMAIL_ENABLED:
+        return
 
-def send_confirmation_emails(booking: Dict[str, Any]) -> None:
     def g(CAPS: str, form: str) -> Any:
         return booking.get(CAPS) if CAPS in booking else booking.get(form)
 
@@ -565,26 +992,31 @@ def send_confirmation_emails(booking: Dict[str, Any]) -> None:
     teacher  = g("Teacher","teacher")
     admin_to = st.secrets.get("ADMIN_EMAIL","")
 
-    _send_async(sp_email, "✅ Your Cordova Class is Confirmed",
+    messages = [(sp_email, "✅ Your Cordova Class is Confirmed",
         f"Dear {sp_name},\n\nYour class has been successfully booked.\n\n"
         f"School: {school}\nGrade: {grade}\nSubject: {subj}\nDate: {day}\n"
-        f"Slot: {slot}\nType: {btype}\nTopic: {topic}\n")
+        f"Slot: {slot}\nType: {btype}\nTopic: {topic}\n")]
 
     t_email = get_teacher_email(teacher)
     if t_email:
-        _send_async(t_email, "✅ New Cordova Session Assigned",
+        messages.append((t_email, "✅ New Cordova Session Assigned",
             "You have a new session to conduct.\n\n"
             f"Subject: {subj}\nDate: {day}\nSlot: {slot}\nSchool: {school}\n"
-            f"Grade: {grade}\nType: {btype}\nTopic: {topic}\n")
+            f"Grade: {grade}\nType: {btype}\nTopic: {topic}\n"))
 
     if admin_to:
-        _send_async(admin_to, "📢 New Cordova Booking Created",
+        messages.append((admin_to, "📢 New Cordova Booking Created",
             "A new booking has been created:\n\n"
             f"School: {school}\nGrade: {grade}\nSubject: {subj}\nDate: {day}\n"
             f"Slot: {slot}\nType: {btype}\nTopic: {topic}\nTeacher: {teacher}\n"
-            f"Salesperson: {sp_name}\nSalesperson Email: {sp_email}\n")
+            f"Salesperson: {sp_name}\nSalesperson Email: {sp_email}\n"))
+
+    _send_many(messages, wait)
+
+def send_cancellation_emails(booking: Dict[str, Any], wait: Optional[bool] = None) -> None:
+    if not _EMAIL_ENABLED:
+        return
 
-def send_cancellation_emails(booking: Dict[str, Any]) -> None:
     def g(CAPS: str, form: str) -> Any:
         return booking.get(CAPS) if CAPS in booking else booking.get(form)
 
@@ -597,20 +1029,22 @@ def send_cancellation_emails(booking: Dict[str, Any]) -> None:
     slot     = g("Slot","slot")
     teacher  = g("Teacher","teacher")
 
-    _smtp_send(
+    messages = [(
         sp_email,
         "❌ Cordova Class Cancelled",
         f"Dear {sp_name},\n\nYour scheduled class has been cancelled.\n\n"
         f"School: {school}\nGrade: {grade}\nSubject: {subj}\nDate: {day}\nSlot: {slot}\n"
-    )
+    )]
     t_email = get_teacher_email(teacher)
     if t_email:
-        _smtp_send(
+        messages.append((
             t_email,
             "❌ Cordova Session Cancelled",
             "Your assigned session has been cancelled.\n\n"
             f"Subject: {subj}\nDate: {day}\nSlot: {slot}\nSchool: {school}\nGrade: {grade}\n"
-        )
+        ))
+
+    _send_many(messages, wait)
 
 
 # -----------------------------------------------------------------------------
@@ -638,7 +1072,7 @@ def resend_email(event_id: int):
         to_addr, subject = row["to_addr"], row["subject"]
     else:
         to_addr, subject = row
-    _smtp_send(to_addr, subject, f"[RESEND] This is a resend attempt for '{subject}'.")
+    _send_async(to_addr, subject, f"[RESEND] This is a resend attempt for '{subject}'.")
 
 
 # -----------------------------------------------------------------------------
@@ -647,13 +1081,20 @@ def resend_email(event_id: int):
 def mark_unavailable(teacher: str, day: str, slot: Optional[str]) -> None:
     _exec("INSERT INTO teacher_unavailability (teacher, date, slot) VALUES (%s, %s, %s)",
           (teacher, day, slot))
+    _clear_unavail_caches()
 
+@st.cache_data(show_spinner=False, ttl=60)
 def list_unavailability() -> List[Dict[str, Any]]:
     sql = 'SELECT id, teacher AS "Teacher", date AS "Date", slot AS "Slot" FROM teacher_unavailability ORDER BY date DESC'
     return _fetchall_dict(sql)
 
+def _clear_unavail_caches() -> None:
+    list_unavailability.clear()
+    unavailable_teachers_for.clear()
+
 def delete_unavailability(unavail_id: int) -> None:
     _exec("DELETE FROM teacher_unavailability WHERE id=%s", (unavail_id,))
+    _clear_unavail_caches()
 
 # Backward-compatible names used by your admin UI
 def mark_teacher_unavailable(teacher: str, day: str, slot: Optional[str]):
@@ -672,3 +1113,4 @@ def delete_teacher_unavailability(teacher_or_id, day=None, slot=None):
         else:
             _exec("DELETE FROM teacher_unavailability WHERE teacher=%s AND date=%s AND slot IS NULL",
                   (teacher_or_id, day))
+        _clear_unavail_caches()
@@ -1,8 +1,12 @@
 import sqlite3
+from pathlib import Path
 
 DB_PATH = "cordova_publication.db"
 
+# Read once per process; repeat initialize_database() calls are a single lookup.
+_SCHEMA = Path(__file__).with_name("schema.sql").read_text(encoding="utf-8")
+
 def initialize_database():
     with sqlite3.connect(DB_PATH) as conn:
-        with open("schema.sql", "r", encoding="utf-8") as f:
-            conn.executescript(f.read())
+        if not conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='bookings'").fetchone():
+            conn.executescript(_SCHEMA)
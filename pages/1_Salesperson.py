@@ -1,28 +1,37 @@
 # salesperson_portal.py
 
 import streamlit as st
-import pandas as pd
 from datetime import datetime, date, time, timedelta
 from zoneinfo import ZoneInfo
 
-from backend import (
-    pick_teacher, teacher_busy, exists_booking,
-    record_booking, get_bookings_for_salesperson,
-    send_confirmation_emails, is_teacher_unavailable
-)
-from teacher_mapping import candidates_for_subject
-
 # ---------------------------------------------------------------------
-# Page setup & light styling
+# Constants (tuple literals are compiled once, not rebuilt per rerun)
 # ---------------------------------------------------------------------
-st.set_page_config(page_title="Salesperson Portal", page_icon="🧑‍💼", layout="wide")
-st.markdown("""
+_HIDE_CSS = """
 <style>
 #MainMenu, footer, header {visibility: hidden;}
 [data-testid="stDecoration"] {display: none;}
 .block-container {padding-top: 1.2rem; padding-bottom: 1.2rem;}
 </style>
-""", unsafe_allow_html=True)
+"""
+
+SLOTS = (
+    "10:00–10:40", "10:40–11:20", "11:20–12:00",
+    "12:20–13:00", "13:00–13:40", "13:40–14:20", "14:20–15:00", "15:00–15:40"
+)
+SUBJECTS = ("Hindi","Mathematics","GK","SST","Science","English","Pre Primary","EVS","Computer")
+CURRICULA = ("CBSE","ICSE","State Board","Other")
+BOOKING_TYPES = ("Live Class","Product Training")
+
+@st.cache_resource
+def _tz() -> ZoneInfo:
+    return ZoneInfo(st.secrets.get("TIMEZONE", "Asia/Kolkata"))
+
+# ---------------------------------------------------------------------
+# Page setup & light styling
+# ---------------------------------------------------------------------
+st.set_page_config(page_title="Salesperson Portal", page_icon="🧑‍💼", layout="wide")
+st.markdown(_HIDE_CSS, unsafe_allow_html=True)
 
 # ---------------------------------------------------------------------
 # Login
@@ -45,11 +54,23 @@ def salesperson_login_form():
             st.session_state["salesperson_name"] = name.strip()
             st.session_state["salesperson_number"] = phone.strip()
             st.session_state["salesperson_email"] = email.strip()
-            st.rerun()
 
+# The form lives in a placeholder so a successful login can clear it and carry
+# on in the same run instead of forcing another full rerun.
+login_slot = st.empty()
 if not salesperson_logged_in():
-    salesperson_login_form()
-    st.stop()
+    with login_slot.container():
+        salesperson_login_form()
+    if not salesperson_logged_in():
+        st.stop()
+login_slot.empty()
+
+# Imported only once logged in; the login screen never pays for DB/secrets setup
+from backend import (
+    try_record_booking, BookingStatus, get_bookings_for_salesperson, count_bookings_for_salesperson,
+    send_confirmation_emails, unavailable_teachers_for
+)
+from teacher_mapping import candidates_for_subject
 
 with st.sidebar:
     st.caption(f"Logged in as: {st.session_state.get('salesperson_name')}")
@@ -58,22 +79,13 @@ with st.sidebar:
         st.rerun()
 
 # ---------------------------------------------------------------------
-# Timezone & constants
+# Timezone
 # ---------------------------------------------------------------------
-TZ = st.secrets.get("TIMEZONE", "Asia/Kolkata")
-_now = datetime.now(ZoneInfo(TZ))
+_now = datetime.now(_tz())
 TODAY = _now.date()
 TOMORROW = TODAY + timedelta(days=1)
 MAX_DAY = TODAY + timedelta(days=60)
 
-SLOTS = [
-    "— Select slot —", "10:00–10:40", "10:40–11:20", "11:20–12:00",
-    "12:20–13:00", "13:00–13:40", "13:40–14:20", "14:20–15:00", "15:00–15:40"
-]
-SUBJECTS = ["— Select subject —","Hindi","Mathematics","GK","SST","Science","English","Pre Primary","EVS","Computer"]
-CURRICULA = ["— Select curriculum —","CBSE","ICSE","State Board","Other"]
-BOOKING_TYPES = ["Live Class","Product Training"]
-
 # ---------------------------------------------------------------------
 # Date selection OUTSIDE the form (so disabled state updates live)
 # ---------------------------------------------------------------------
@@ -90,21 +102,18 @@ with date_col:
         help="Bookings must be made at least one day in advance.",
         key="picked_date"              # persist across reruns
     )
+    date_str = picked_date.strftime("%Y-%m-%d")  # reused by the form, hint and submit
 
 with rule_col:
-    IST_now = datetime.now(ZoneInfo(TZ))
-    today = IST_now.date()
-    tomorrow = today + timedelta(days=1)
-
     # picked_date is a datetime.date already
-    delta_days = (picked_date - today).days
-    after_two_pm = IST_now.time() >= time(14, 0)
+    delta_days = (picked_date - TODAY).days
+    after_two_pm = _now.time() >= time(14, 0)
 
     # Disable rule: only if "tomorrow" AND time >= 14:00 IST
     disable_submit = (delta_days == 1) and after_two_pm
 
     # User hint
-    if picked_date == tomorrow:
+    if picked_date == TOMORROW:
         if after_two_pm:
             st.warning("📯 It’s past **02:00 PM IST** today. You can’t book for **tomorrow** anymore. Please choose a later date.")
         else:
@@ -120,12 +129,12 @@ with st.form("booking_form", clear_on_submit=False):
         booking_type = st.selectbox("Booking Type", BOOKING_TYPES, index=0)
         school_name  = st.text_input("School Name")
         title_used   = st.text_input("Title Used by School")
-        curriculum   = st.selectbox("Curriculum", CURRICULA, index=0)
-        subject      = st.selectbox("Subject", SUBJECTS, index=0)
-        slot         = st.selectbox("Slot", SLOTS, index=0)
+        curriculum   = st.selectbox("Curriculum", CURRICULA, index=None, placeholder="— Select curriculum —")
+        subject      = st.selectbox("Subject", SUBJECTS, index=None, placeholder="— Select subject —")
+        slot         = st.selectbox("Slot", SLOTS, index=None, placeholder="— Select slot —")
 
         # Show the chosen date (read-only) to avoid duplicate pickers
-        st.text_input("Selected Date", value=picked_date.strftime("%Y-%m-%d"), disabled=True)
+        st.text_input("Selected Date", value=date_str, disabled=True)
 
     with col2:
         grade = st.text_input("Grade (Live Class only)") if booking_type == "Live Class" else None
@@ -140,15 +149,27 @@ with st.form("booking_form", clear_on_submit=False):
 # ---------------------------------------------------------------------
 # Availability hint (outside the form so it refreshes live)
 # ---------------------------------------------------------------------
-if subject != SUBJECTS[0] and slot != SLOTS[0]:
-    tlist = candidates_for_subject(subject)
-    if tlist:
-        unavailable = [t for t in tlist if is_teacher_unavailable(t, picked_date.strftime("%Y-%m-%d"), slot)]
-        available   = [t for t in tlist if t not in unavailable]
-        if available:
-            st.success(f"Likely teacher: {available[0]}")
-        else:
-            st.error("All mapped teachers are unavailable for this slot.")
+@st.cache_data(ttl=3600, show_spinner=False)
+def _candidates(subject: str) -> list[str]:
+    return candidates_for_subject(subject)
+
+def _compute_hint(subject: str, day: str, slot: str):
+    """First available mapped teacher, "" if all are blocked, None if none are mapped."""
+    tlist = _candidates(subject)
+    if not tlist:
+        return None
+    # Cached in backend and cleared whenever admin marks/unmarks a teacher
+    blocked = unavailable_teachers_for(day, slot, tlist)
+    return next((t for t in tlist if t not in blocked), "")
+
+if subject is not None and slot is not None:
+    # Both lookups are cached; the unavailability one is cleared on admin changes,
+    # so the hint is recomputed each run rather than pinned in session state
+    likely = _compute_hint(subject, date_str, slot)
+    if likely:
+        st.success(f"Likely teacher: {likely}")
+    elif likely is not None:
+        st.error("All mapped teachers are unavailable for this slot.")
 
 # ---------------------------------------------------------------------
 # Submit handling
@@ -160,48 +181,45 @@ def invalid(msg: str):
 if submit:
     if not school_name.strip():
         invalid("School Name is required.")
-    elif curriculum == CURRICULA[0]:
+    elif curriculum is None:
         invalid("Please select a curriculum.")
-    elif subject == SUBJECTS[0]:
+    elif subject is None:
         invalid("Please select a subject.")
-    elif slot == SLOTS[0]:
+    elif slot is None:
         invalid("Please select a slot.")
     elif booking_type == "Live Class" and (not grade or not grade.strip()):
         invalid("Grade is required for Live Class.")
-    elif exists_booking(school_name.strip(), subject, picked_date.strftime("%Y-%m-%d"), slot):
-        st.warning("A booking already exists for this School, Subject, Date and Slot.")
     else:
-        teacher = pick_teacher(subject, picked_date.strftime("%Y-%m-%d"), slot)
-        if not teacher:
-            st.error("No teacher available for this subject/date/slot.")
-        elif teacher_busy(teacher, picked_date.strftime("%Y-%m-%d"), slot):
-            st.error("Selected teacher is already booked in this slot.")
-        else:
-            data = {
-                "booking_type": booking_type,
-                "school_name": school_name.strip(),
-                "title_used": title_used.strip(),
-                "grade": grade.strip() if (booking_type == "Live Class" and grade) else None,
-                "curriculum": curriculum,
-                "subject": subject,
-                "date": picked_date.strftime("%Y-%m-%d"),
-                "slot": slot,
-                "topic": (topic or "").strip(),
-                "salesperson_name": st.session_state["salesperson_name"],
-                "salesperson_number": st.session_state["salesperson_number"],
-                "salesperson_email": st.session_state["salesperson_email"],
-                "teacher": teacher,
-            }
-            try:
-                ok, msg, _ = record_booking(data)  # backend still enforces the rule too
-                if not ok:
-                    st.error(msg)
-                else:
-                    send_confirmation_emails(data)
+        data = {
+            "booking_type": booking_type,
+            "school_name": school_name.strip(),
+            "title_used": title_used.strip(),
+            "grade": grade.strip() if (booking_type == "Live Class" and grade) else None,
+            "curriculum": curriculum,
+            "subject": subject,
+            "date": date_str,
+            "slot": slot,
+            "topic": (topic or "").strip(),
+            "salesperson_name": st.session_state["salesperson_name"],
+            "salesperson_number": st.session_state["salesperson_number"],
+            "salesperson_email": st.session_state["salesperson_email"],
+        }
+        try:
+            # Duplicate check, teacher pick and insert happen in one backend transaction
+            result = try_record_booking(data)
+            match result.status:
+                case BookingStatus.OK:
+                    teacher = data["teacher"] = result.teacher
+                    send_confirmation_emails(data, wait=False)  # queued on the mail pool; don't block the rerun
+                    # No st.rerun(): the bookings panel below renders later in this run, and
+                    # try_record_booking already cleared backend's cached booking lists.
                     st.success(f"✅ Booked! Teacher: {teacher} | {subject} | {data['date']} {slot}")
-                    st.rerun()
-            except Exception as e:
-                st.exception(e)
+                case BookingStatus.DUPLICATE:
+                    st.warning(result.message)
+                case _:
+                    st.error(result.message)
+        except Exception as e:
+            st.exception(e)
 
 # ---------------------------------------------------------------------
 # My Bookings (with local-time display for 'Booked On')
@@ -209,27 +227,44 @@ if submit:
 st.divider()
 st.subheader("📋 My Bookings")
 
-rows = get_bookings_for_salesperson(st.session_state["salesperson_email"])
-if not rows:
-    st.info("No bookings found.")
-else:
-    df = pd.DataFrame(rows)
-
-    # Pretty-print "Booked On" using your timezone
-    if "Booked On" in df.columns:
-        from datetime import datetime as _dt
-        def _to_local(ts: str) -> str:
-            s = str(ts)
-            try:
-                if s.endswith("Z"):
-                    dt = _dt.fromisoformat(s.replace("Z", "+00:00"))
-                else:
-                    dt = _dt.fromisoformat(s)
-                    if dt.tzinfo is None:
-                        dt = dt.replace(tzinfo=ZoneInfo("UTC"))
-                return dt.astimezone(ZoneInfo(TZ)).strftime("%Y-%m-%d %H:%M:%S")
-            except Exception:
-                return s
-        df["Booked On"] = df["Booked On"].apply(_to_local)
-
-    st.dataframe(df, use_container_width=True, hide_index=True)
+MY_BOOKINGS_PAGE_SIZE = 50
+# Same order as backend.get_bookings_for_salesperson's SELECT
+MY_BOOKING_COLUMNS = ("Type", "School", "Subject", "Date", "Slot", "Topic", "Teacher", "Booked On")
+
+@st.fragment
+def _my_bookings_panel():
+    # Own rerun scope: paging through the table doesn't rerun the booking form
+    # Both reads are cached in backend and cleared on every booking insert/delete
+    email = st.session_state["salesperson_email"]
+    total = count_bookings_for_salesperson(email)
+    if not total:
+        st.info("No bookings found.")
+    else:
+        pages = max(1, (total + MY_BOOKINGS_PAGE_SIZE - 1) // MY_BOOKINGS_PAGE_SIZE)
+        page = st.number_input("Page", 1, pages, 1, key="my_bookings_page") if pages > 1 else 1
+        rows = get_bookings_for_salesperson(
+            email, MY_BOOKINGS_PAGE_SIZE, (int(page) - 1) * MY_BOOKINGS_PAGE_SIZE
+        )
+
+        import pandas as pd  # only needed once there is a table to show
+        df = pd.DataFrame.from_records(rows, columns=MY_BOOKING_COLUMNS)
+
+        # Pretty-print "Booked On" using your timezone
+        if "Booked On" in df.columns:
+            booked = pd.to_datetime(df["Booked On"], utc=True, errors="coerce", format="ISO8601")
+            df["Booked On"] = (
+                booked.dt.tz_convert(_tz()).dt.strftime("%Y-%m-%d %H:%M:%S")
+                .fillna(df["Booked On"].astype(str))
+            )
+
+        # Typed columns keep Arrow serialization cheap; formatting is left to column_config
+        df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
+        for c in ("Type", "Subject", "Slot"):
+            df[c] = df[c].astype("category")
+
+        st.dataframe(
+            df, use_container_width=True, hide_index=True,
+            column_config={"Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD")},
+        )
+
+_my_bookings_panel()
@@ -7,44 +7,6 @@ import sys, os, traceback, importlib.util
 from pathlib import Path
 from datetime import date
 
-# ---------- Robust import of backend.py ----------
-ROOT = Path(__file__).resolve().parents[1]
-BACKEND_FILE = ROOT / "backend.py"
-if str(ROOT) not in sys.path:
-    sys.path.insert(0, str(ROOT))
-
-def _bind_from(mod):
-    # bookings
-    globals()["get_all_bookings"] = mod.get_all_bookings
-    globals()["delete_booking"] = mod.delete_booking
-    # unavailability
-    globals()["mark_unavailable"] = mod.mark_unavailable
-    globals()["list_unavailability"] = mod.list_unavailability
-    globals()["delete_unavailability"] = mod.delete_unavailability
-    # emails
-    globals()["send_cancellation_emails"] = mod.send_cancellation_emails
-    globals()["get_email_events"] = mod.get_email_events
-    globals()["resend_email"] = mod.resend_email
-
-try:
-    import backend as _bk
-    _bind_from(_bk)
-except Exception:
-    try:
-        if BACKEND_FILE.exists():
-            spec = importlib.util.spec_from_file_location("backend", str(BACKEND_FILE))
-            _bk = importlib.util.module_from_spec(spec)
-            sys.modules["backend"] = _bk
-            assert spec.loader is not None
-            spec.loader.exec_module(_bk)
-            _bind_from(_bk)
-        else:
-            raise ImportError(f"backend.py not found at {BACKEND_FILE}")
-    except Exception as e:
-        st.error("Failed to import backend.py. Ensure the file exists in the repo root.")
-        st.code("".join(traceback.format_exception_only(type(e), e)))
-        st.stop()
-
 # ---------- Page config & chrome ----------
 st.set_page_config(page_title="Admin Dashboard", page_icon="🔐", layout="wide")
 st.markdown("""
@@ -76,6 +38,35 @@ if not admin_logged_in():
     admin_login_form()
     st.stop()
 
+# ---------- Robust import of backend.py (deferred until after login) ----------
+ROOT = Path(__file__).resolve().parents[1]
+BACKEND_FILE = ROOT / "backend.py"
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+@st.cache_resource(show_spinner=False)
+def _load_backend():
+    # Resolved once per process; later reruns reuse the module object directly
+    try:
+        import backend
+        return backend
+    except Exception:
+        if not BACKEND_FILE.exists():
+            raise ImportError(f"backend.py not found at {BACKEND_FILE}")
+        spec = importlib.util.spec_from_file_location("backend", str(BACKEND_FILE))
+        mod = importlib.util.module_from_spec(spec)
+        sys.modules["backend"] = mod
+        assert spec.loader is not None
+        spec.loader.exec_module(mod)
+        return mod
+
+try:
+    _bk = _load_backend()
+except Exception as e:
+    st.error("Failed to import backend.py. Ensure the file exists in the repo root.")
+    st.code("".join(traceback.format_exception_only(type(e), e)))
+    st.stop()
+
 with st.sidebar:
     if st.button("Logout", use_container_width=True):
         st.session_state.clear()
@@ -90,103 +81,219 @@ tab_view, tab_unavail, tab_email = st.tabs(
 # =======================
 # 📋 View & Delete Bookings
 # =======================
+# Column order of backend._BOOKINGS_SELECT, minus the id split off for paging/deletes
+_BOOKING_COLS = (
+    "Type", "School", "Title Used", "Grade", "Curriculum", "Subject", "Date", "Slot",
+    "Topic", "Teacher", "Salesperson", "Salesperson Number", "Salesperson Email", "Booked On",
+)
+
+def _local_booked_on(col):
+    # Timestamps are stored in UTC; show them in the app's timezone like My Bookings does
+    import pandas as pd
+    booked = pd.to_datetime(col, utc=True, errors="coerce", format="ISO8601")
+    return booked.dt.tz_convert(_bk.TZINFO).dt.strftime("%Y-%m-%d %H:%M:%S").fillna(col.astype(str))
+
+@st.dialog("Confirm deletion")
+def _confirm_delete(booking_id: int, row: dict):
+    # Modal render: opening or dismissing it doesn't rerun the page
+    st.warning("This will delete the booking and trigger cancellation emails.")
+    st.json({k: row[k] for k in ["School","Subject","Date","Slot","Teacher","Salesperson"]})
+    if st.button("Yes, delete", type="primary", use_container_width=True):
+        try:
+            # Queued on backend's mail pool; `row` is a plain copy, so deleting right away is safe
+            _bk.send_cancellation_emails(row, wait=False)
+            _bk.delete_booking(booking_id)
+        except Exception as e:
+            st.exception(e)
+        else:
+            st.toast("Booking deleted and cancellation emails triggered.")
+            st.rerun()
+
+@st.fragment
+def _bookings_view(facets):
+    # Filters, table and delete picker rerun on their own; the other tabs stay put
+    with st.expander("Filters", expanded=False):
+        f1, f2, f3, f4 = st.columns(4)
+        subj = f1.selectbox("Subject", ["(All)"] + facets["Subject"])
+        sp   = f2.selectbox("Salesperson", ["(All)"] + facets["Salesperson"])
+        sch  = f3.selectbox("School", ["(All)"] + facets["School"])
+        day  = f4.date_input("Date", value=None, format="YYYY-MM-DD")
+        # Search only applies on Enter/Apply, not on every keystroke
+        with st.form("search_form", border=False):
+            q = st.text_input("Search", placeholder="School / Subject / Teacher")
+            if st.form_submit_button("Apply"):
+                st.session_state["effective_query"] = q.strip().lower()
+    query = st.session_state.get("effective_query", "")
+
+    # Filtering, search and paging run in SQL; only the visible page is loaded
+    filters = dict(
+        subject=None if subj == "(All)" else subj,
+        salesperson=None if sp == "(All)" else sp,
+        school=None if sch == "(All)" else sch,
+        day=str(day) if isinstance(day, date) else None,
+        q=query or None,
+    )
+
+    st.subheader("All Bookings")
+    page_size = st.slider("Rows per page", 10, 100, 25, key="pg_size")
+    total = _bk.count_bookings_filtered(**filters)
+    pages = max(1, (total + page_size - 1) // page_size)
+
+    # Keyset paging: the stack holds the (Date, id) cursor each visited page started after
+    sig = (tuple(filters.items()), page_size)
+    if st.session_state.get("pg_cursor_sig") != sig:
+        st.session_state["pg_cursor_sig"] = sig
+        st.session_state["pg_cursor_stack"] = [None]
+    stack = st.session_state["pg_cursor_stack"]
+    rows = _bk.get_bookings_page(**filters, after=stack[-1], limit=page_size)
+    # ids only drive the cursor and the delete picker; keep them out of the display frame
+    ids = [r.pop("id") for r in rows]
+
+    n1, n2, n3 = st.columns([1, 2, 1])
+    if n1.button("◀ Prev", disabled=len(stack) <= 1, use_container_width=True):
+        stack.pop()
+        st.rerun(scope="fragment")
+    n2.caption(f"Page {len(stack)} of {pages}")
+    if n3.button("Next ▶", disabled=len(stack) >= pages or len(rows) < page_size, use_container_width=True):
+        stack.append((rows[-1]["Date"], ids[-1]))
+        st.rerun(scope="fragment")
+
+    import pandas as pd
+    fdf = pd.DataFrame.from_records(rows, columns=_BOOKING_COLS)
+    if not fdf.empty:
+        # Typed copy for display only; fdf keeps raw values for labels and cancellation emails
+        view_df = fdf.assign(
+            Date=pd.to_datetime(fdf["Date"], errors="coerce"),
+            **{"Booked On": _local_booked_on(fdf["Booked On"])},
+            **{c: fdf[c].astype("category")
+               for c in ("Type", "Curriculum", "Subject", "Slot", "School", "Teacher", "Salesperson")},
+        )
+        st.dataframe(
+            view_df, use_container_width=True, hide_index=True,
+            column_config={"Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD")},
+        )
+
+    st.divider()
+    st.subheader("Delete a Booking")
+
+    if fdf.empty:
+        st.info("No rows to delete based on current filters.")
+    else:
+        labels = pd.Series(ids, index=fdf.index).astype(str).str.cat(
+            [fdf["School"], fdf["Subject"], fdf["Date"].astype(str) + " " + fdf["Slot"], fdf["Teacher"]],
+            sep=" | ",
+        )
+        id_to_row = dict(zip(ids, fdf.to_dict("records")))
+        choice = st.selectbox("Select booking", labels.tolist(), key="del_choice")
+        chosen_id = int(choice.split(" | ", 1)[0])
+        chosen_row = id_to_row[chosen_id]
+
+        if st.button("Delete Booking ❌", type="primary"):
+            _confirm_delete(chosen_id, chosen_row)
+
+EXPORT_BATCH_SIZE = 5000
+
+def _stream_csv(batch_size: int = EXPORT_BATCH_SIZE):
+    # One encoded CSV chunk per backend batch; only one batch of rows is alive at a time
+    import pandas as pd
+    header = True
+    for batch in _bk.iter_bookings(batch_size):
+        df = pd.DataFrame.from_records(batch, columns=("id",) + _BOOKING_COLS).drop(columns=["id"])
+        df["Booked On"] = _local_booked_on(df["Booked On"])
+        yield df.to_csv(index=False, header=header).encode("utf-8")
+        header = False
+
 with tab_view:
-    rows = get_all_bookings()
-    if not rows:
+    facets = _bk.get_booking_facets()
+    if not facets["total"]:
         st.info("No bookings found.")
     else:
-        import pandas as pd
-        df = pd.DataFrame(rows)
-
         cA, cB, cC = st.columns(3)
-        cA.metric("Total bookings", len(df))
-        cB.metric("Unique schools", df["School"].nunique())
-        cC.metric("Unique teachers", df["Teacher"].nunique())
-
-        with st.expander("Filters", expanded=False):
-            f1, f2, f3, f4 = st.columns(4)
-            subj = f1.selectbox("Subject", ["(All)"] + sorted(df["Subject"].dropna().unique().tolist()))
-            sp   = f2.selectbox("Salesperson", ["(All)"] + sorted(df["Salesperson"].dropna().unique().tolist()))
-            sch  = f3.selectbox("School", ["(All)"] + sorted(df["School"].dropna().unique().tolist()))
-            day  = f4.date_input("Date", value=None, format="YYYY-MM-DD")
-            query = st.text_input("Search", placeholder="School / Subject / Teacher").strip().lower()
-
-        fdf = df.copy()
-        if subj != "(All)": fdf = fdf[fdf["Subject"] == subj]
-        if sp   != "(All)": fdf = fdf[fdf["Salesperson"] == sp]
-        if sch  != "(All)": fdf = fdf[fdf["School"] == sch]
-        if isinstance(day, date): fdf = fdf[fdf["Date"] == str(day)]
-        if query:
-            mask = (
-                fdf["School"].str.lower().str.contains(query, na=False) |
-                fdf["Subject"].str.lower().str.contains(query, na=False) |
-                fdf["Teacher"].str.lower().str.contains(query, na=False)
-            )
-            fdf = fdf[mask]
+        cA.metric("Total bookings", facets["total"])
+        cB.metric("Unique schools", facets["schools"])
+        cC.metric("Unique teachers", facets["teachers"])
 
-        st.subheader("All Bookings")
-        page_size = st.slider("Rows per page", 10, 100, 25, key="pg_size")
-        pages = max(1, (len(fdf) + page_size - 1) // page_size)
-        page = st.number_input("Page", 1, pages, 1, key="pg_no")
-        start = (page - 1) * page_size
-        view_df = fdf.drop(columns=["id"]).iloc[start:start + page_size]
-        st.dataframe(view_df, use_container_width=True, hide_index=True)
+        _bookings_view(facets)
 
         st.divider()
-        st.subheader("Delete a Booking")
-
-        if fdf.empty:
-            st.info("No rows to delete based on current filters.")
-        else:
-            fdf["label"] = (
-                fdf["id"].astype(str) + " | " + fdf["School"] + " | " + fdf["Subject"] + " | " +
-                fdf["Date"] + " " + fdf["Slot"] + " | " + fdf["Teacher"]
+        # Built only on request: st.download_button needs the whole payload up front,
+        # so chunks go straight into one bytes buffer (no joined str + encoded copy)
+        if st.button("Prepare CSV export"):
+            import io
+            out = io.BytesIO()
+            for chunk in _stream_csv():
+                out.write(chunk)
+            out.seek(0)
+            st.download_button(
+                "Download bookings.csv",
+                data=out,
+                file_name=f"bookings_{date.today()}.csv",
+                mime="text/csv",
             )
-            choice = st.selectbox("Select booking", fdf["label"].tolist(), key="del_choice")
-            chosen_id = int(choice.split(" | ", 1)[0])
-            chosen_row = fdf[fdf["id"] == chosen_id].iloc[0].to_dict()
-
-            confirm_key = "confirm_delete_open"
-            if st.button("Delete Booking ❌", type="primary"):
-                st.session_state[confirm_key] = True
-
-            if st.session_state.get(confirm_key):
-                st.warning("This will delete the booking and trigger cancellation emails.")
-                st.json({k: chosen_row[k] for k in ["School","Subject","Date","Slot","Teacher","Salesperson"]})
-                c1, c2 = st.columns(2)
-                with c1:
-                    if st.button("Yes, delete", type="primary", use_container_width=True, key="confirm_del_yes"):
-                        try:
-                            send_cancellation_emails(chosen_row)  # send emails first
-                            delete_booking(chosen_id)
-                            st.session_state[confirm_key] = False
-                            st.success("Booking deleted and cancellation emails triggered.")
-                            st.rerun()
-                        except Exception as e:
-                            st.session_state[confirm_key] = False
-                            st.exception(e)
-                with c2:
-                    if st.button("Cancel", use_container_width=True, key="confirm_del_no"):
-                        st.session_state[confirm_key] = False
-                        st.info("Deletion cancelled.")
 
 # =======================
 # 🧑‍🏫 Teacher Unavailability
 # =======================
-with tab_unavail:
-    st.subheader("Mark Teacher Unavailable")
+@st.dialog("Remove unavailability")
+def _confirm_unavail_delete(unavail_id: int, label: str):
+    st.warning("Remove this unavailability entry?")
+    st.write(label)
+    if st.button("Yes, remove", type="primary", use_container_width=True):
+        try:
+            _bk.delete_unavailability(unavail_id)
+        except Exception as e:
+            st.exception(e)
+        else:
+            st.toast("Unavailability removed.")
+            st.rerun()
 
-    from teacher_mapping import TEACHER_MAP
-    all_from_map = {t for lst in TEACHER_MAP.values() for t in lst}
-    rows_for_teachers = get_all_bookings()
-    all_from_bookings = {r["Teacher"] for r in rows_for_teachers} if rows_for_teachers else set()
+@st.fragment
+def _unavailability_list():
+    st.subheader("Current Unavailability")
+    urows = _bk.list_unavailability()
+    if not urows:
+        st.info("No unavailability entries.")
+    else:
+        import pandas as pd
+        udf = pd.DataFrame.from_records(urows, columns=("id", "Teacher", "Date", "Slot"))
+        view_udf = udf[["Teacher","Date","Slot"]].assign(
+            Teacher=udf["Teacher"].astype("category"),
+            Date=pd.to_datetime(udf["Date"], errors="coerce"),
+            Slot=udf["Slot"].fillna("Full Day").astype("category"),
+        )
+        st.dataframe(
+            view_udf, use_container_width=True, hide_index=True,
+            column_config={"Date": st.column_config.DateColumn("Date", format="YYYY-MM-DD")},
+        )
+
+        labels = udf["id"].astype(str).str.cat(
+            [udf["Teacher"], udf["Date"].astype(str), udf["Slot"].fillna("Full Day")], sep=" | "
+        ).tolist()
+        to_remove = st.selectbox("Remove entry", labels, key="unavail_pick")
+        unavail_id = int(to_remove.split(" | ", 1)[0])
 
-    def prettify_key(k: str) -> str:
-        s = k.upper().replace("_MAAM", " Ma'am").replace("_SIR", " Sir").replace("_", " ").title()
-        return s.replace("Ma'Am", "Ma'am")
+        if st.button("Unmark (Delete Entry) ✅"):
+            _confirm_unavail_delete(unavail_id, to_remove)
 
-    all_from_secrets = {prettify_key(k) for k in st.secrets.get("TEACHER_EMAILS", {}).keys()}
-    teacher_options = sorted(all_from_map | all_from_bookings | all_from_secrets)
+def prettify_key(k: str) -> str:
+    s = k.upper().replace("_MAAM", " Ma'am").replace("_SIR", " Sir").replace("_", " ").title()
+    return s.replace("Ma'Am", "Ma'am")
+
+@st.cache_resource
+def _pretty_teacher_secrets() -> frozenset[str]:
+    # Secrets are fixed for the life of the process
+    return frozenset(prettify_key(k) for k in st.secrets.get("TEACHER_EMAILS", {}).keys())
+
+def _teacher_options() -> list[str]:
+    # Mapped teachers + anyone already booked + teachers with an email in secrets.
+    # Each piece is cached on its own; only the DB one is cleared on booking writes.
+    from teacher_mapping import MAP_TEACHERS
+    return sorted(MAP_TEACHERS.union(_bk.get_distinct_teachers(), _pretty_teacher_secrets()))
+
+with tab_unavail:
+    st.subheader("Mark Teacher Unavailable")
+
+    teacher_options = _teacher_options()
 
     colA, colB, colC = st.columns(3)
     teacher = colA.selectbox("Teacher", ["— Select teacher —"] + teacher_options + ["(Type name manually)"])
@@ -203,7 +310,7 @@ with tab_unavail:
             st.error("Please select or type a teacher name.")
         else:
             try:
-                mark_unavailable(chosen_teacher, str(day), None if slot == "(Full Day)" else slot)
+                _bk.mark_unavailable(chosen_teacher, str(day), None if slot == "(Full Day)" else slot)
                 st.success(f"Marked {chosen_teacher} unavailable on {day} "
                            f"{'(full day)' if slot == '(Full Day)' else slot}.")
                 st.rerun()
@@ -211,65 +318,36 @@ with tab_unavail:
                 st.exception(e)
 
     st.divider()
-    st.subheader("Current Unavailability")
-    urows = list_unavailability()
-    if not urows:
-        st.info("No unavailability entries.")
-    else:
-        import pandas as pd
-        udf = pd.DataFrame(urows)
-        st.dataframe(udf[["Teacher","Date","Slot"]], use_container_width=True, hide_index=True)
-
-        labels = [f"{r['id']} | {r['Teacher']} | {r['Date']} | {r['Slot'] or 'Full Day'}" for r in urows]
-        to_remove = st.selectbox("Remove entry", labels, key="unavail_pick")
-        unavail_id = int(to_remove.split(" | ", 1)[0])
-
-        u_confirm_key = "confirm_unavail_delete_open"
-        if st.button("Unmark (Delete Entry) ✅"):
-            st.session_state[u_confirm_key] = True
-
-        if st.session_state.get(u_confirm_key):
-            st.warning("Remove this unavailability entry?")
-            st.write(to_remove)
-            c1, c2 = st.columns(2)
-            with c1:
-                if st.button("Yes, remove", type="primary", use_container_width=True, key="u_confirm_yes"):
-                    try:
-                        delete_unavailability(unavail_id)
-                        st.session_state[u_confirm_key] = False
-                        st.success("Unavailability removed.")
-                        st.rerun()
-                    except Exception as e:
-                        st.session_state[u_confirm_key] = False
-                        st.exception(e)
-            with c2:
-                if st.button("Cancel", use_container_width=True, key="u_confirm_no"):
-                    st.session_state[u_confirm_key] = False
-                    st.info("Removal cancelled.")
+    _unavailability_list()
 
 # =======================
 # 📧 Email Log (view + resend)
 # =======================
-with tab_email:
+@st.fragment
+def _email_log():
     st.subheader("Email Log (latest 200)")
     import pandas as pd
-    events = get_email_events(200)
+    events = _bk.get_email_events(200)
     if not events:
         st.info("No email events yet.")
     else:
-        df = pd.DataFrame(events)
-        st.dataframe(df, use_container_width=True, hide_index=True)
-
-        ids = [f"{r['id']} | {r['ts']} | {r['to']} | {r['status']}" for r in events]
+        df = pd.DataFrame.from_records(events, columns=("id", "ts", "to", "subject", "status", "error"))
+        st.dataframe(
+            df.assign(status=df["status"].astype("category")),
+            use_container_width=True, hide_index=True,
+        )
+
+        ids = df["id"].astype(str).str.cat(
+            [df["ts"].astype(str), df["to"], df["status"]], sep=" | "
+        ).tolist()
         pick = st.selectbox("Select an event to resend", ids, key="resend_pick")
         event_id = int(pick.split(" | ", 1)[0])
         if st.button("Resend selected email"):
             try:
-                resend_email(event_id)
+                _bk.resend_email(event_id)
                 st.success("Resend queued/sent (check Email Log for new entry).")
             except Exception as e:
                 st.exception(e)
 
-
-
-
+with tab_email:
+    _email_log()
@@ -28,7 +28,10 @@ CREATE TABLE IF NOT EXISTS teacher_unavailability (
 -- Helpful indexes
 CREATE INDEX IF NOT EXISTS idx_bookings_date ON bookings(date);
 CREATE INDEX IF NOT EXISTS idx_bookings_teacher ON bookings(teacher);
+CREATE INDEX IF NOT EXISTS idx_bookings_sp_date_ts ON bookings(salesperson_email, date, timestamp);
+CREATE INDEX IF NOT EXISTS idx_bookings_date_id ON bookings(date, id);
 CREATE INDEX IF NOT EXISTS idx_unavail_teacher_date ON teacher_unavailability(teacher, date);
+CREATE INDEX IF NOT EXISTS idx_unavail_date_slot ON teacher_unavailability(date, slot);
 
 -- Safeguards
 -- Prevent same School+Subject on same Date+Slot
@@ -11,5 +11,8 @@ TEACHER_MAP = {
     "Computer": ["Arpit", "Geetanjali"],
 }
 
+# Every mapped teacher, computed once at import
+MAP_TEACHERS = frozenset().union(*TEACHER_MAP.values())
+
 def candidates_for_subject(subject: str):
     return TEACHER_MAP.get(subject, [])